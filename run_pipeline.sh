@@ -9,13 +9,10 @@ echo "Pipeline started at $(date)" | tee -a $LOG_FILE
 # Step 1: Extract
 python3 scripts/extract.py 2>&1 | tee -a $LOG_FILE
 
-# Step 2: Transform
+# Step 2: Transform + Load (transform ab seedha SQLite me bhi likhta hai)
 python3 scripts/transform.py 2>&1 | tee -a $LOG_FILE
 
-# Step 3: Load
-python3 scripts/load.py 2>&1 | tee -a $LOG_FILE
-
-# Step 4: Visualize
+# Step 3: Visualize
 python3 scripts/visualize.py 2>&1 | tee -a $LOG_FILE
 
 echo "Pipeline finished at $(date)" | tee -a $LOG_FILE
@@ -1,6 +1,7 @@
 # scripts/extract.py
 """
 Extract weather data from Open-Meteo API and save raw JSON to data/raw/.
+All configured cities are fetched in a single batched request.
 Usage:
     python3 scripts/extract.py
 """
@@ -8,41 +9,73 @@ import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import os
-import json
 from datetime import date, timedelta
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from config import LOCATIONS, BASE_URL, HOURLY_VARS, TIMEZONE, RAW_DIR
 
 
 # Ensure raw dir exists
 os.makedirs(RAW_DIR, exist_ok=True)
 
-def build_params(lat, lon, start_date, end_date):
+# Request parts that never change between calls, built once at import time
+# (no re-join/re-alloc per request, which matters inside retry loops)
+_HOURLY = ",".join(HOURLY_VARS)
+_BASE_PARAMS = {"hourly": _HOURLY, "timezone": TIMEZONE}
+
+def build_params(lats, lons, start_date, end_date):
+    """Open-Meteo accepts comma-separated coordinate lists for batched calls."""
     return {
-        "latitude": lat,
-        "longitude": lon,
-        "hourly": ",".join(HOURLY_VARS),
+        "latitude": ",".join(str(lat) for lat in lats),
+        "longitude": ",".join(str(lon) for lon in lons),
         "start_date": start_date,
         "end_date": end_date,
-        "timezone": TIMEZONE,
+        **_BASE_PARAMS,
     }
 
-def fetch_weather_for_location(name, lat, lon, start_date, end_date, timeout=10):
+def make_session():
+    """
+    Session with transparent retries: transient failures (DNS blip, 5xx,
+    rate limit) back off 0.3s/0.6s/1.2s and reuse the pooled connection,
+    instead of losing the whole run and re-running the pipeline by hand.
     """
-    Fetch JSON from Open-Meteo for given lat/lon and date range.
-    Returns JSON dict on success, raises requests.HTTPError on failure.
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def fetch_weather_batch(session, cities, start_date, end_date, timeout=10):
     """
-    params = build_params(lat, lon, start_date, end_date)
-    resp = requests.get(BASE_URL, params=params, timeout=timeout)
+    Fetch JSON for all cities in one request. Open-Meteo returns a list with
+    one entry per coordinate pair, in the order they were sent.
+    Returns that list on success, raises requests.HTTPError on failure.
+    """
+    lats = [LOCATIONS[city]["lat"] for city in cities]
+    lons = [LOCATIONS[city]["lon"] for city in cities]
+    params = build_params(lats, lons, start_date, end_date)
+    resp = session.get(BASE_URL, params=params, timeout=timeout)
     resp.raise_for_status()
-    return resp.json()
+    data = resp.json()
+    # With a single coordinate the API returns a plain dict, not a list
+    if isinstance(data, dict):
+        data = [data]
+    return data
 
 def save_raw_json(city_name, start_date, end_date, data):
     """Save raw JSON to data/raw/<city>_<start>_<end>.json"""
     safe_name = city_name.replace(" ", "_")
     filename = f"{RAW_DIR}/{safe_name}_{start_date}_{end_date}.json"
     with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
     return filename
 
 def main(days_back=1):
@@ -54,19 +87,22 @@ def main(days_back=1):
     start_date = (today - timedelta(days=days_back)).isoformat()
     end_date = today.isoformat()
 
-    print(f"Fetching weather data from {start_date} to {end_date} for {len(LOCATIONS)} locations.")
-    for city, coords in LOCATIONS.items():
-        lat = coords["lat"]
-        lon = coords["lon"]
+    cities = list(LOCATIONS)
+    print(f"Fetching weather data from {start_date} to {end_date} for {len(cities)} locations (one batched request).")
+    try:
+        batch = fetch_weather_batch(make_session(), cities, start_date, end_date)
+    except requests.HTTPError as e:
+        print(f"   HTTP error: {e}")
+        return
+    except requests.RequestException as e:
+        print(f"   Request failed: {e}")
+        return
+
+    # Route each response element back to its city by position
+    for city, data in zip(cities, batch):
         try:
-            print(f"-> Fetching {city} ({lat},{lon}) ...")
-            data = fetch_weather_for_location(city, lat, lon, start_date, end_date)
             saved = save_raw_json(city, start_date, end_date, data)
             print(f"   Saved raw JSON to: {saved}")
-        except requests.HTTPError as e:
-            print(f"   HTTP error for {city}: {e}")
-        except requests.RequestException as e:
-            print(f"   Request failed for {city}: {e}")
         except Exception as e:
             print(f"   Unexpected error for {city}: {e}")
 
@@ -1,25 +1,67 @@
 # scripts/transform.py
 """
-Transform raw weather JSON (data/raw/*.json) into clean tabular CSVs (data/processed/).
+Transform raw weather JSON (data/raw/*.json) into clean tabular Parquet files
+(data/processed/) and load the combined result straight into SQLite
+(data/weather.db, table: weather_data). Pass --csv to additionally write the
+master file as CSV for eyeballing in a spreadsheet.
 Run from project root:
-    python3 scripts/transform.py
+    python3 scripts/transform.py [--csv]
 """
 
 import sys
 import os
-import json
+import mmap
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from glob import glob
 from datetime import datetime
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+from numba import njit
 
 # Make sure project root is in sys.path so `config` imports work when run as a script
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import RAW_DIR, PROCESSED_DIR, HOURLY_VARS  # config constants
+from config import RAW_DIR, PROCESSED_DIR, DATA_DIR, DB_FILE, HOURLY_VARS  # config constants
 
 # Ensure processed dir exists
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
 
+@njit(cache=True)
+def _fill_gaps_inplace(a):
+    """
+    Fill NaNs in a (rows, cols) float32 array in one pass per column:
+    linear interpolation between valid neighbours, edge NaNs copied from the
+    nearest valid value. Equivalent to interpolate() + ffill() + bfill() but
+    a single memory traversal with no intermediate frames.
+    Columns with no valid value at all are left as-is.
+    """
+    n, m = a.shape
+    for col in range(m):
+        prev = -1  # index of the last valid value seen in this column
+        for i in range(n):
+            v = a[i, col]
+            if v == v:  # not NaN
+                if prev == -1 and i > 0:
+                    # leading edge: backfill from the first valid value
+                    for j in range(i):
+                        a[j, col] = v
+                elif prev != -1 and i - prev > 1:
+                    # interior gap: linear interpolation
+                    left = a[prev, col]
+                    step = (v - left) / (i - prev)
+                    for j in range(prev + 1, i):
+                        a[j, col] = left + step * (j - prev)
+                prev = i
+        if prev != -1 and prev < n - 1:
+            # trailing edge: forward fill from the last valid value
+            last = a[prev, col]
+            for j in range(prev + 1, n):
+                a[j, col] = last
+
+
 def infer_city_and_dates_from_filename(filepath):
     """
     Example filename: data/raw/Karachi_2025-08-27_2025-08-28.json
@@ -44,11 +86,20 @@ def process_single_raw_file(filepath):
     - Normalize hourly -> pandas DataFrame
     - Clean/handle missing values
     - Add metadata columns (city, latitude, longitude)
-    - Save per-file CSV and append to master CSV
+    - Save per-file CSV and return the DataFrame for the master CSV
     """
     print(f"Processing: {filepath}")
-    with open(filepath, "r", encoding="utf-8") as f:
-        raw = json.load(f)
+    # Memory-map the file and hand the view straight to orjson: no userspace
+    # copy of the bytes, and the OS page cache is shared across the worker
+    # processes reading these files.
+    with open(filepath, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            # orjson takes bytes/memoryview, not mmap objects; the memoryview
+            # wrapper keeps this zero-copy
+            raw = orjson.loads(memoryview(mm))
+        finally:
+            mm.close()
 
     # Basic validation
     hourly = raw.get("hourly")
@@ -63,15 +114,23 @@ def process_single_raw_file(filepath):
     if not available_vars:
         available_vars = [k for k in hourly.keys() if k != "time"]
 
-    # Build dictionary for DataFrame
-    data_dict = {"time": times}
-    for var in available_vars:
-        data_dict[var] = hourly.get(var, [None] * len(times))
-
-    df = pd.DataFrame(data_dict)
-
-    # Convert time column to pandas datetime for easier processing
-    df["time"] = pd.to_datetime(df["time"])
+    # Build an Arrow Table with an explicit schema, then convert to pandas:
+    # the declared layout (timestamps + float32 measurements, plenty for
+    # weather readings) means no dtype inference at all, JSON nulls map to
+    # NaN, and each column lands in one contiguous buffer. Arrow won't turn
+    # raw ISO strings into a declared timestamp column by itself, so build a
+    # string array and cast it — the parse still happens in Arrow's C kernel.
+    schema = pa.schema(
+        [("time", pa.timestamp("ns"))] + [(var, pa.float32()) for var in available_vars]
+    )
+    table = pa.Table.from_pydict(
+        {
+            "time": pa.array(times, type=pa.string()).cast(pa.timestamp("ns")),
+            **{var: hourly.get(var, [None] * len(times)) for var in available_vars},
+        },
+        schema=schema,
+    )
+    df = table.to_pandas()
 
     # Add metadata columns if available in raw JSON
     # Some APIs include latitude/longitude in root
@@ -92,14 +151,16 @@ def process_single_raw_file(filepath):
     if measure_cols:
         df = df.dropna(axis=0, how="all", subset=measure_cols)
 
-        # 2. Interpolate numeric gaps (linear). Then forward/back fill remaining edge NaNs.
-        try:
-            df[measure_cols] = df[measure_cols].interpolate(method="linear", limit_direction="both")
-            df[measure_cols] = df[measure_cols].ffill().bfill()
+        # 2. Fill numeric gaps (linear interpolation + edge fill) in a single
+        #    compiled pass; columns are float32 already, so this keeps the
+        #    frame at float32. copy=True because to_numpy may hand back a
+        #    read-only view, which the in-place kernel cannot write to.
+        arr = df[measure_cols].to_numpy(dtype=np.float32, copy=True)
+        _fill_gaps_inplace(arr)
+        df[measure_cols] = arr
 
-        except Exception as e:
-            # If interpolation fails (e.g., non-numeric), just forward/backfill
-            df[measure_cols] = df[measure_cols].ffill().bfill()
+    # city repeats one value per row; category stores it as small int codes
+    df["city"] = df["city"].astype("category")
 
 
     # 3. Reorder columns for readability: time, city, latitude, longitude, measures...
@@ -114,27 +175,19 @@ def process_single_raw_file(filepath):
     df = df[cols]
 
     # ------------------ Save outputs ------------------
-    # Save per-file processed CSV
+    # Save per-file processed Parquet (columnar + zstd: much smaller than CSV
+    # and downstream readers get typed columns back without re-parsing text)
     safe_city = city.replace(" ", "_")
     if start_date and end_date:
-        out_name = f"{safe_city}_{start_date}_{end_date}.csv"
+        out_name = f"{safe_city}_{start_date}_{end_date}.parquet"
     else:
         # fallback to timestamped filename
-        out_name = f"{safe_city}_processed_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
+        out_name = f"{safe_city}_processed_{datetime.now().strftime('%Y%m%d%H%M%S')}.parquet"
     out_path = os.path.join(PROCESSED_DIR, out_name)
-    df.to_csv(out_path, index=False)
-    print(f"  Saved processed CSV: {out_path}")
-
-    # Also append to a master CSV (all cities)
-    master_path = os.path.join(PROCESSED_DIR, "all_cities_hourly.csv")
-    if not os.path.exists(master_path):
-        df.to_csv(master_path, index=False, mode="w", header=True)
-        print(f"  Created master CSV: {master_path}")
-    else:
-        df.to_csv(master_path, index=False, mode="a", header=False)
-        print(f"  Appended to master CSV: {master_path}")
+    df.to_parquet(out_path, index=False, compression="zstd")
+    print(f"  Saved processed Parquet: {out_path}")
 
-    return out_path
+    return df
 
 
 def main():
@@ -143,11 +196,63 @@ def main():
         print(f"No raw JSON files found in {RAW_DIR}. Run extract step first.")
         return
 
-    for fpath in raw_files:
-        try:
-            process_single_raw_file(fpath)
-        except Exception as e:
-            print(f"  Error processing {fpath}: {e}")
+    # Each raw file is independent (parse + interpolate is CPU-bound), so
+    # fan out across cores. Workers only write their own per-file CSV; the
+    # master CSV is written once here to avoid append races between workers.
+    dfs = []
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {executor.submit(process_single_raw_file, fpath): fpath for fpath in raw_files}
+        for future in as_completed(futures):
+            fpath = futures[future]
+            try:
+                df = future.result()
+                if df is not None:
+                    dfs.append(df)
+            except Exception as e:
+                print(f"  Error processing {fpath}: {e}")
+
+    if dfs:
+        # One concat + one write: a single buffered write and a single
+        # serializer startup, instead of reopening the file per input file.
+        # Sort so the master file row order is stable regardless of which
+        # worker finished first.
+        master = pd.concat(dfs, ignore_index=True)
+        # Each per-file categorical has a different single category, so the
+        # concat above falls back to object dtype — re-cast on the combined
+        # frame so the master outputs actually keep the category codes
+        master["city"] = master["city"].astype("category")
+        master = master.sort_values(["city", "time"])
+        master_path = os.path.join(PROCESSED_DIR, "all_cities_hourly.parquet")
+        master.to_parquet(master_path, index=False, compression="zstd")
+        print(f"Wrote master Parquet: {master_path} ({len(master)} rows)")
+
+        # Optional human-readable export
+        if "--csv" in sys.argv:
+            csv_path = os.path.join(PROCESSED_DIR, "all_cities_hourly.csv")
+            master.to_csv(csv_path, index=False)
+            print(f"Wrote master CSV: {csv_path}")
+
+        # Load straight into SQLite here instead of re-parsing the processed
+        # file in a separate load step — one serialization round-trip less.
+        # Single batched write from the parent, so workers never touch the DB.
+        db_path = os.path.join(DATA_DIR, DB_FILE)
+        conn = sqlite3.connect(db_path)
+        conn.executescript("PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;")
+        with conn:
+            master.to_sql(
+                "weather_data",
+                conn,
+                if_exists="replace",
+                index=False,
+                method="multi",
+                chunksize=10_000,
+            )
+            # Index so visualize's WHERE city/time predicates don't full-scan
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_city_time ON weather_data(city, time)"
+            )
+        conn.close()
+        print(f"Loaded {len(master)} rows into SQLite: {db_path}, table: weather_data")
 
 
 if __name__ == "__main__":
@@ -2,23 +2,31 @@
 """
 Create simple charts (PNG images) from the ETL output.
 - Prefers SQLite DB (data/weather.db, table: weather_data)
-- Falls back to CSV (data/processed/all_cities_hourly.csv) if DB not found
+- Falls back to Parquet (data/processed/all_cities_hourly.parquet) if DB not found
 - Saves charts into reports/ folder
+- Default renderer draws PNGs directly with Pillow (fast); pass --fancy to
+  render through matplotlib instead (nicer ticks/fonts for presentations)
 
 Run from project root:
-    python3 scripts/visualize.py
+    python3 scripts/visualize.py [--fancy]
 """
 
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 import sqlite3
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from PIL import Image, ImageDraw
 from pathlib import Path
 
+FANCY = "--fancy" in sys.argv
+
 # ---- Paths
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DB_PATH = PROJECT_ROOT / "data" / "weather.db"
+PARQUET_PATH = PROJECT_ROOT / "data" / "processed" / "all_cities_hourly.parquet"
 CSV_PATH = PROJECT_ROOT / "data" / "processed" / "all_cities_hourly.csv"
 REPORTS_DIR = PROJECT_ROOT / "reports"
 
@@ -29,99 +37,250 @@ REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 def load_dataset(days_back: int = 2) -> pd.DataFrame:
     """
     Load last N days of data.
-    Priority: SQLite DB -> CSV fallback.
+    Priority: SQLite DB -> Parquet fallback -> CSV fallback (--csv export).
     Returns a DataFrame with at least: time, city, temperature_2m, relativehumidity_2m, precipitation
     """
+    cutoff = pd.Timestamp.now() - pd.Timedelta(days=days_back)
+
     if DB_PATH.exists():
         conn = sqlite3.connect(DB_PATH)
         try:
-            df = pd.read_sql_query("SELECT * FROM weather_data", conn)
+            # Push the time filter into SQL so SQLite only hands back the
+            # rows we plot, and let pandas parse timestamps in the C layer.
+            # Bind the cutoff with a space separator to match how the
+            # timestamps are stored ("2025-08-27 06:00:00"); isoformat()'s
+            # 'T' separator sorts after ' ' and would drop the cutoff day.
+            df = pd.read_sql_query(
+                "SELECT * FROM weather_data WHERE time >= ?",
+                conn,
+                params=[cutoff.strftime("%Y-%m-%d %H:%M:%S")],
+                parse_dates=["time"],
+            )
         finally:
             conn.close()
+    elif PARQUET_PATH.exists():
+        df = pd.read_parquet(PARQUET_PATH)
+        # Filter to last N days
+        df = df[df["time"] >= cutoff]
     elif CSV_PATH.exists():
-        df = pd.read_csv(CSV_PATH)
+        # pyarrow's CSV reader tokenizes blocks on multiple threads, unlike
+        # pandas's single-threaded parser
+        from pyarrow import csv as pacsv
+
+        table = pacsv.read_csv(
+            CSV_PATH,
+            read_options=pacsv.ReadOptions(use_threads=True, block_size=4 << 20),
+        )
+        df = table.to_pandas()
+        df["time"] = pd.to_datetime(df["time"])
+        df = df[df["time"] >= cutoff]
     else:
         raise FileNotFoundError(
-            "No data source found. Run the pipeline first (extract -> transform -> load)."
+            "No data source found. Run the pipeline first (extract -> transform)."
         )
 
-    # Ensure proper dtypes
-    df["time"] = pd.to_datetime(df["time"])
-    # Filter to last N days
-    cutoff = pd.Timestamp.now() - pd.Timedelta(days=days_back)
-    df = df[df["time"] >= cutoff]
+    # category makes the per-city filtering an integer-code comparison
+    df["city"] = df["city"].astype("category")
 
     # Sort for nice plotting
     df = df.sort_values(["city", "time"]).reset_index(drop=True)
     return df
 
 
-def plot_city_timeseries(df: pd.DataFrame, city: str) -> None:
+# ---- Fast renderer: draw straight onto a Pillow canvas, no matplotlib
+# artist tree or font stack. Good enough for line/bar trend reports.
+_CANVAS_W, _CANVAS_H = 960, 720
+_MARGIN_L, _MARGIN_R, _MARGIN_T, _MARGIN_B = 80, 30, 50, 60
+_LINE_COLOR = (31, 119, 180)  # matplotlib's default C0 blue
+_AXIS_COLOR = (60, 60, 60)
+_GRID_COLOR = (225, 225, 225)
+
+
+def _render_chart_pil(kind, x, y, title, ylabel, out_path):
+    """Rasterize one line/bar chart with numpy + Pillow and save it as PNG."""
+    # Normalize to ns first: depending on the source, the datetime column may
+    # be us-resolution, and the tick labels below assume ns since epoch
+    xs = x.astype("datetime64[ns]").astype("int64").to_numpy(dtype=np.float64)
+    ys = y.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(ys)
+    xs, ys = xs[valid], ys[valid]
+    if len(xs) == 0:
+        print(f"[skip] No valid values for: {out_path}")
+        return
+
+    x0, x1 = xs.min(), xs.max()
+    y0, y1 = ys.min(), ys.max()
+    if kind == "bar":
+        y0 = min(y0, 0.0)  # bars grow from zero
+    if x1 == x0:
+        x1 = x0 + 1
+    if y1 == y0:
+        y1 = y0 + 1
+
+    plot_w = _CANVAS_W - _MARGIN_L - _MARGIN_R
+    plot_h = _CANVAS_H - _MARGIN_T - _MARGIN_B
+    px = _MARGIN_L + (xs - x0) / (x1 - x0) * plot_w
+    py = _MARGIN_T + (y1 - ys) / (y1 - y0) * plot_h
+
+    img = Image.new("RGB", (_CANVAS_W, _CANVAS_H), "white")
+    draw = ImageDraw.Draw(img)
+
+    # y grid + tick labels
+    for frac in (0.0, 0.25, 0.5, 0.75, 1.0):
+        gy = _MARGIN_T + frac * plot_h
+        gv = y1 - frac * (y1 - y0)
+        draw.line([(_MARGIN_L, gy), (_CANVAS_W - _MARGIN_R, gy)], fill=_GRID_COLOR)
+        draw.text((8, gy - 6), f"{gv:.1f}", fill=_AXIS_COLOR)
+
+    # x tick labels (timestamps)
+    for frac in (0.0, 0.25, 0.5, 0.75, 1.0):
+        gx = _MARGIN_L + frac * plot_w
+        gt = pd.Timestamp(int(x0 + frac * (x1 - x0)))
+        draw.line([(gx, _MARGIN_T), (gx, _CANVAS_H - _MARGIN_B)], fill=_GRID_COLOR)
+        draw.text((gx - 34, _CANVAS_H - _MARGIN_B + 8), gt.strftime("%m-%d %H:%M"), fill=_AXIS_COLOR)
+
+    # data
+    if kind == "bar":
+        base_y = _MARGIN_T + (y1 - max(y0, 0.0)) / (y1 - y0) * plot_h
+        bar_w = max(1, int(plot_w / (len(xs) * 1.5)))
+        for bx, by in zip(px, py):
+            draw.rectangle([bx - bar_w / 2, min(by, base_y), bx + bar_w / 2, max(by, base_y)], fill=_LINE_COLOR)
+    else:
+        draw.line(list(zip(px, py)), fill=_LINE_COLOR, width=2)
+
+    # axes frame + labels
+    draw.rectangle(
+        [_MARGIN_L, _MARGIN_T, _CANVAS_W - _MARGIN_R, _CANVAS_H - _MARGIN_B],
+        outline=_AXIS_COLOR,
+    )
+    # Pillow's default bitmap font has no em-dash glyph, so swap it for a hyphen
+    draw.text((_MARGIN_L, 16), f"{title}  [{ylabel}]".replace("—", "-"), fill=(0, 0, 0))
+    draw.text((_CANVAS_W // 2 - 15, _CANVAS_H - 24), "Time", fill=_AXIS_COLOR)
+
+    # compress_level=1: much faster PNG encode than the default level 6,
+    # trend charts do not need maximum compression
+    img.save(out_path, optimize=False, compress_level=1)
+    print(f"[ok] Saved: {out_path}")
+
+
+# ---- Fancy renderer (matplotlib, behind --fancy). One Figure/Axes reused
+# for every chart: figure construction (renderer, font cache, layout engine)
+# is the heavy part of small plots, so pay for it once and just clear the
+# axes between charts. Imported lazily so the default path never loads
+# matplotlib at all.
+_FIG = None
+_AX = None
+_DATE_LOCATOR = None
+_DATE_FORMATTER = None
+
+
+def _get_axes():
+    global _FIG, _AX, _DATE_LOCATOR, _DATE_FORMATTER
+    if _FIG is None:
+        import matplotlib
+        matplotlib.use("Agg")  # headless rendering, no GUI backend probing
+        import matplotlib.dates as mdates
+        import matplotlib.pyplot as plt
+        # Decimate nearly-collinear points when rasterizing lines
+        plt.rcParams["path.simplify_threshold"] = 1.0
+        # All charts share the same time axis, so build the tick machinery
+        # once instead of letting every chart run its own AutoDateLocator
+        # pass (which dominates render time on small plots)
+        _DATE_LOCATOR = mdates.AutoDateLocator()
+        _DATE_FORMATTER = mdates.ConciseDateFormatter(_DATE_LOCATOR)
+        _FIG, _AX = plt.subplots()
+    return _FIG, _AX
+
+
+def _render_chart_mpl(kind, x, y, title, ylabel, out_path):
+    """Render one line/bar chart onto the shared matplotlib axes and save it."""
+    fig, ax = _get_axes()
+    ax.cla()
+    if kind == "bar":
+        ax.bar(x, y)
+    else:
+        ax.plot(x, y)
+    # cla() resets the axis, so re-attach the shared locator/formatter
+    ax.xaxis.set_major_locator(_DATE_LOCATOR)
+    ax.xaxis.set_major_formatter(_DATE_FORMATTER)
+    ax.set_title(title)
+    ax.set_xlabel("Time")
+    ax.set_ylabel(ylabel)
+    fig.tight_layout()
+    fig.savefig(out_path, dpi=150)
+    print(f"[ok] Saved: {out_path}")
+
+
+def _save_chart(kind, x, y, title, ylabel, out_path):
+    if FANCY:
+        _render_chart_mpl(kind, x, y, title, ylabel, out_path)
+    else:
+        _render_chart_pil(kind, x, y, title, ylabel, out_path)
+
+
+def plot_city_timeseries(cdf: pd.DataFrame, city: str) -> None:
     """
-    Create three plots for a given city:
+    Create three plots for one city's (already filtered) rows:
     1) Temperature (line)
     2) Humidity (line)
     3) Precipitation (bar)
     Files are saved into reports/ as PNG.
     """
-    cdf = df[df["city"] == city].copy()
     if cdf.empty:
         print(f"[skip] No rows for city: {city}")
         return
 
-    # --- Temperature
-    plt.figure()
-    plt.plot(cdf["time"], cdf["temperature_2m"])
-    plt.title(f"Temperature (°C) — {city}")
-    plt.xlabel("Time")
-    plt.ylabel("°C")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    out_path = REPORTS_DIR / f"temp_trend_{city.replace(' ', '_')}.png"
-    plt.savefig(out_path, dpi=150)
-    plt.close()
-    print(f"[ok] Saved: {out_path}")
+    safe_city = city.replace(" ", "_")
+
+    _save_chart(
+        "line", cdf["time"], cdf["temperature_2m"],
+        f"Temperature (°C) — {city}", "°C",
+        REPORTS_DIR / f"temp_trend_{safe_city}.png",
+    )
 
-    # --- Humidity
     if "relativehumidity_2m" in cdf.columns:
-        plt.figure()
-        plt.plot(cdf["time"], cdf["relativehumidity_2m"])
-        plt.title(f"Relative Humidity (%) — {city}")
-        plt.xlabel("Time")
-        plt.ylabel("%")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        out_path = REPORTS_DIR / f"humidity_trend_{city.replace(' ', '_')}.png"
-        plt.savefig(out_path, dpi=150)
-        plt.close()
-        print(f"[ok] Saved: {out_path}")
-
-    # --- Precipitation
+        _save_chart(
+            "line", cdf["time"], cdf["relativehumidity_2m"],
+            f"Relative Humidity (%) — {city}", "%",
+            REPORTS_DIR / f"humidity_trend_{safe_city}.png",
+        )
+
     if "precipitation" in cdf.columns:
-        plt.figure()
-        plt.bar(cdf["time"], cdf["precipitation"])
-        plt.title(f"Precipitation (mm) — {city}")
-        plt.xlabel("Time")
-        plt.ylabel("mm")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        out_path = REPORTS_DIR / f"precipitation_{city.replace(' ', '_')}.png"
-        plt.savefig(out_path, dpi=150)
-        plt.close()
-        print(f"[ok] Saved: {out_path}")
+        _save_chart(
+            "bar", cdf["time"], cdf["precipitation"],
+            f"Precipitation (mm) — {city}", "mm",
+            REPORTS_DIR / f"precipitation_{safe_city}.png",
+        )
+
+
+def _plot_group(group):
+    """Worker entry point: render all charts for one (city, frame) group."""
+    city, cdf = group
+    plot_city_timeseries(cdf, city)
+    return city
 
 
 def main():
     print(">>> Starting visualize.py ...")
     print("DB exists?", DB_PATH.exists())
-    print("CSV exists?", CSV_PATH.exists())
+    print("Parquet exists?", PARQUET_PATH.exists())
 
     df = load_dataset(days_back=2)
     print(">>> Loaded rows:", len(df))
 
-    for city in sorted(df["city"].dropna().unique()):
-        print(">>> Plotting for city:", city)
-        plot_city_timeseries(df, city)
+    # One groupby pass splits the frame per city, instead of rescanning the
+    # whole DataFrame once per city
+    groups = list(df.groupby("city", sort=True, observed=True))
+    if not groups:
+        print("[skip] No cities to plot.")
+        return
+
+    # Rasterizing + PNG encoding is CPU-bound and independent per city, so
+    # render cities in parallel; each worker keeps its own matplotlib state
+    # (and its own shared figure, thanks to the lazy _get_axes).
+    with ProcessPoolExecutor(max_workers=min(len(groups), os.cpu_count())) as executor:
+        for city in executor.map(_plot_group, groups):
+            print(">>> Plotted city:", city)
 
     print("\n✅ Charts created in the 'reports/' folder.")
 